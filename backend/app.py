@@ -7,8 +7,13 @@ import io
 import re
 from datetime import datetime, timedelta
 import uuid
+import shutil
 from werkzeug.utils import secure_filename
 from nl_query_service import NaturalLanguageQueryService
+from dataset_store import DatasetStore
+from cost_processing import transform_csv_to_cost_data
+from bulk_ingest import bulk_ingest, bulk_suffix
+from forecasting import CostForecaster, summarize_series
 
 app = Flask(__name__)
 CORS(app)
@@ -19,101 +24,21 @@ nl_service = NaturalLanguageQueryService()
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 DATABASE = 'data.db'
+DATASETS_FOLDER = 'datasets'
+DATASET_GRACE_PERIOD = int(os.getenv('DATASET_GRACE_PERIOD', '300'))
+# Server-side folder that /upload/bulk may read from via `path`; unset disables it
+BULK_INGEST_ROOT = os.getenv('BULK_INGEST_ROOT')
 ALLOWED_EXTENSIONS = {'csv'}
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-def normalize_date(date_str):
-    """Normalize date string to YYYY-MM-DD format"""
-    try:
-        date = pd.to_datetime(date_str)
-        return date.strftime('%Y-%m-%d')
-    except:
-        return date_str
-
-def normalize_service_name(service):
-    """Map AWS service codes to friendly names"""
-    service_map = {
-        'AmazonEC2': 'EC2',
-        'AmazonS3': 'S3', 
-        'AmazonRDS': 'RDS',
-        'AWSLambda': 'Lambda',
-        'AmazonCloudFront': 'CloudFront',
-        'AmazonDynamoDB': 'DynamoDB',
-        'AmazonECS': 'ECS',
-        'AmazonEKS': 'EKS',
-        'AmazonElastiCache': 'ElastiCache',
-        'AmazonVPC': 'VPC',
-        'AmazonRoute53': 'Route53',
-    }
-    return service_map.get(service, service)
+# Each upload is written to its own database file and published atomically,
+# so readers never see tables that are being replaced
+dataset_store = DatasetStore(DATASETS_FOLDER, legacy_database=DATABASE, grace_period=DATASET_GRACE_PERIOD)
 
-def extract_tags(row):
-    """Extract tags from AWS CSV row"""
-    tags = {}
-    for col in row.index:
-        if col.startswith('resourceTags/') or col.startswith('tag:'):
-            tag_name = col.replace('resourceTags/', '').replace('tag:', '')
-            if pd.notna(row[col]) and row[col]:
-                tags[tag_name] = str(row[col])
-    return tags if tags else None
-
-def transform_csv_to_cost_data(df):
-    """Transform CSV DataFrame to CostDataPoint format"""
-    cost_data = []
-    
-    for _, row in df.iterrows():
-        # Try different column name formats for AWS Cost & Usage Report
-        date = (row.get('lineItem/UsageStartDate') or 
-                row.get('UsageStartDate') or 
-                row.get('Date') or 
-                row.get('date') or '')
-        
-        service = (row.get('lineItem/ProductCode') or
-                  row.get('ProductCode') or
-                  row.get('Service') or
-                  row.get('service') or 'Unknown')
-        
-        region = (row.get('product/region') or
-                 row.get('Region') or
-                 row.get('region') or 'global')
-        
-        cost_str = (row.get('lineItem/UnblendedCost') or
-                   row.get('UnblendedCost') or
-                   row.get('Cost') or
-                   row.get('cost') or '0')
-        
-        try:
-            cost = float(cost_str) if pd.notna(cost_str) else 0
-        except (ValueError, TypeError):
-            cost = 0
-        
-        # Only include rows with valid date and positive cost
-        if date and cost > 0:
-            normalized_date = normalize_date(date)
-            normalized_service = normalize_service_name(service)
-            
-            cost_point = {
-                'date': normalized_date,
-                'service': normalized_service,
-                'region': region or 'global',
-                'cost': round(cost, 2),
-            }
-            
-            # Add optional fields if they exist
-            resource_id = (row.get('lineItem/ResourceId') or 
-                          row.get('ResourceId'))
-            if resource_id and pd.notna(resource_id):
-                cost_point['resourceId'] = str(resource_id)
-            
-            tags = extract_tags(row)
-            if tags:
-                cost_point['tags'] = str(tags)  # Convert dict to string for SQLite storage
-                
-            cost_data.append(cost_point)
-    
-    return cost_data
+# Forecasts are cached per dataset version since published versions never change
+cost_forecaster = CostForecaster()
 
 def generate_anomalies(cost_data):
     """Generate cost anomalies based on the data"""
@@ -232,9 +157,8 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Open the current dataset version; the connection stays pinned to it"""
+    return dataset_store.connect()
 
 @app.route('/upload', methods=['POST'])
 def upload_csv():
@@ -264,18 +188,31 @@ def upload_csv():
         anomalies = generate_anomalies(cost_data)
         recommendations = generate_recommendations(cost_data)
         
-        # Store raw CSV data in SQLite for querying
-        conn = get_db_connection()
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
-        
-        # Also store processed cost data for faster access
-        cost_df = pd.DataFrame(cost_data)
-        cost_df.to_sql('processed_cost_data', conn, if_exists='replace', index=False)
-        
+        # Write into a new dataset version so in-flight reads keep their snapshot
+        handle = dataset_store.create_version([table_name, 'processed_cost_data'])
+        conn = sqlite3.connect(handle['path'])
+        try:
+            # Store raw CSV data in SQLite for querying
+            df.to_sql(table_name, conn, if_exists='replace', index=False)
+            
+            # Also store processed cost data for faster access
+            cost_df = pd.DataFrame(cost_data)
+            cost_df.to_sql('processed_cost_data', conn, if_exists='replace', index=False)
+        except Exception:
+            conn.close()
+            dataset_store.discard(handle)
+            raise
         conn.close()
         
+        try:
+            version = dataset_store.publish(handle)
+        except Exception:
+            dataset_store.discard(handle)
+            raise
+        
         return jsonify({
             'message': f'File uploaded and processed successfully',
+            'dataset_version': version,
             'rows': len(df),
             'columns': list(df.columns),
             'results': cost_data,
@@ -295,6 +232,93 @@ def upload_csv():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/upload/bulk', methods=['POST'])
+def upload_bulk():
+    files = request.files.getlist('files')
+    path = request.form.get('path')
+    table_name = request.form.get('table_name', 'cost_data')
+    workers = request.form.get('workers')
+    # All-or-nothing unless the client explicitly accepts skipping failed files
+    allow_partial = request.form.get('allow_partial', 'false').lower() in ('1', 'true', 'yes')
+    
+    files = [file for file in files if file.filename]
+    if not files and not path:
+        return jsonify({'error': 'Provide files or a local path'}), 400
+    
+    # Each worker is a process, so never let a client ask for more than the machine has
+    max_workers = os.cpu_count() or 1
+    if workers is not None:
+        try:
+            workers = int(workers)
+        except ValueError:
+            workers = 0
+        if not 1 <= workers <= max_workers:
+            return jsonify({'error': f'workers must be an integer between 1 and {max_workers}'}), 400
+    
+    for file in files:
+        if not bulk_suffix(file.filename):
+            return jsonify({'error': f'Invalid file type: {file.filename}. Only .csv, .csv.gz and .zip files allowed'}), 400
+    
+    ingest_root = None
+    if path:
+        if not BULK_INGEST_ROOT:
+            return jsonify({'error': 'Server paths are disabled. Set BULK_INGEST_ROOT or use the bulk_ingest.py CLI'}), 400
+        ingest_root = os.path.realpath(BULK_INGEST_ROOT)
+        resolved = os.path.realpath(os.path.join(ingest_root, path))
+        if resolved != ingest_root and not resolved.startswith(ingest_root + os.sep):
+            return jsonify({'error': 'Path must be inside the bulk ingest root'}), 400
+        if not os.path.exists(resolved):
+            return jsonify({'error': f'Path not found: {path}'}), 400
+        path = resolved
+    
+    # Uploaded files are spooled to disk so worker processes can stream them
+    batch_folder = os.path.join(UPLOAD_FOLDER, str(uuid.uuid4()))
+    os.makedirs(batch_folder)
+    
+    try:
+        paths = []
+        names = {}
+        for index, file in enumerate(files):
+            # Spool by position so non-ASCII names keep their extension; reports use the original name
+            file_path = os.path.join(batch_folder, f'{index}{bulk_suffix(file.filename)}')
+            file.save(file_path)
+            paths.append(file_path)
+            names[file_path] = file.filename
+        if path:
+            paths.append(path)
+        
+        result = bulk_ingest(paths, dataset_store, table_name, workers,
+                             allowed_root=ingest_root, allow_partial=allow_partial, names=names)
+        
+        if result['dataset_version'] is None and result['failed']:
+            return jsonify({
+                'error': f'{result["failed"]} files failed to process; nothing was published. Fix them or set allow_partial to skip them.',
+                'files': result['files']
+            }), 422
+        
+        if result['dataset_version'] is None:
+            return jsonify({
+                'error': 'No valid cost data found in the provided files.',
+                'files': result['files']
+            }), 400
+        
+        processed = sum(1 for report in result['files'] if report['status'] == 'ok')
+        
+        return jsonify({
+            'message': f'{processed} of {len(result["files"])} files processed successfully',
+            'dataset_version': result['dataset_version'],
+            'files': result['files'],
+            'cost_rows': result['cost_rows'],
+            'summary': result['summary']
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        shutil.rmtree(batch_folder, ignore_errors=True)
+
 @app.route('/schema', methods=['GET'])
 def get_schema():
     try:
@@ -335,7 +359,8 @@ def ask_question():
     question = data['question']
     
     try:
-        result = nl_service.process_natural_language_query(question)
+        # Pin the dataset version so schema lookup and query see the same data
+        result = nl_service.process_natural_language_query(question, dataset_store.current_path())
         
         if result['success']:
             return jsonify({
@@ -412,5 +437,56 @@ def get_tables():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/forecast', methods=['GET'])
+def get_forecast():
+    service = request.args.get('service')
+    region = request.args.get('region')
+    
+    # Parsed by hand; type=float would silently fall back to the default on bad input
+    try:
+        level = float(request.args.get('level', '0.9'))
+    except ValueError:
+        return jsonify({'error': 'level must be a number between 0 and 1'}), 400
+    
+    if not 0 < level < 1:
+        return jsonify({'error': 'level must be between 0 and 1'}), 400
+    
+    try:
+        # Pin the version so the cache key matches the data that was read
+        version, database_path = dataset_store.current()
+        forecast = cost_forecaster.forecast(database_path, version, level)
+        
+        series = forecast['series']
+        total = forecast['total']
+        if service or region:
+            series = [
+                row for row in series
+                if (not service or row['service'] == service) and (not region or row['region'] == region)
+            ]
+            total = summarize_series(series, level) if series else None
+        
+        return jsonify({
+            'dataset_version': version,
+            'as_of': forecast['as_of'],
+            'month_end': forecast['month_end'],
+            'level': level,
+            'series': series,
+            'total': total
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/versions', methods=['GET'])
+def get_versions():
+    try:
+        return jsonify({
+            'current': dataset_store.current_version(),
+            'versions': dataset_store.list_versions()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from forecasting import CostForecaster, fit_forecast
+
+# Latency budgets for forecasting every series of a large account
+FIT_BUDGET_MS = 250
+END_TO_END_BUDGET_MS = 3000
+
+N_DAYS = 730
+N_SERVICES = 50
+N_REGIONS = 10
+
+
+def make_synthetic_matrix(n_days=N_DAYS, n_series=N_SERVICES * N_REGIONS, seed=0):
+    """Daily costs with a per-series level, trend, weekly pattern and noise"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2022-01-01', periods=n_days, freq='D')
+    t = np.arange(n_days)[:, None]
+    level = rng.uniform(10, 500, n_series)
+    trend = rng.normal(0, 0.2, n_series)
+    weekly = rng.uniform(0, 0.3, n_series) * level
+    weekday = dates.weekday.to_numpy()[:, None]
+    values = level + trend * t + weekly * (weekday >= 5) + rng.normal(0, 5, (n_days, n_series))
+    return dates, np.clip(values, 0, None)
+
+
+def write_synthetic_database(path, dates, values):
+    series = [(f'Service{s}', f'region-{r}') for s in range(N_SERVICES) for r in range(N_REGIONS)]
+    df = pd.DataFrame(values, index=dates.strftime('%Y-%m-%d'), columns=pd.MultiIndex.from_tuples(series))
+    df = df.stack([0, 1], future_stack=True).reset_index()
+    df.columns = ['date', 'service', 'region', 'cost']
+    conn = sqlite3.connect(path)
+    df.to_sql('processed_cost_data', conn, if_exists='replace', index=False)
+    conn.close()
+    return len(df)
+
+
+def time_ms(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def test_fit_latency():
+    """Batched fit over the in-memory date x series matrix"""
+    dates, values = make_synthetic_matrix()
+    elapsed = time_ms(lambda: fit_forecast(dates, values))
+    print(f"Fit {values.shape[1]} series x {values.shape[0]} days: {elapsed:.1f} ms (budget {FIT_BUDGET_MS} ms)")
+    return elapsed <= FIT_BUDGET_MS
+
+
+def test_end_to_end_latency():
+    """Load from processed_cost_data, fit and format, bypassing the cache"""
+    dates, values = make_synthetic_matrix()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.db')
+        rows = write_synthetic_database(path, dates, values)
+        forecaster = CostForecaster()
+        elapsed = time_ms(lambda: forecaster._format(forecaster._fit(path), 0.9), repeat=3)
+        print(f"End to end over {rows} rows: {elapsed:.1f} ms (budget {END_TO_END_BUDGET_MS} ms)")
+
+        forecaster.forecast(path, 'bench', 0.9)
+        cached = time_ms(lambda: forecaster.forecast(path, 'bench', 0.8))
+        print(f"Cached fit, new level: {cached:.1f} ms")
+    return elapsed <= END_TO_END_BUDGET_MS
+
+
+def test_recovers_trend():
+    """A noiseless linear series should be projected exactly"""
+    dates = pd.date_range('2024-01-01', '2024-03-15', freq='D')
+    values = (100 + 2 * np.arange(len(dates), dtype=float))[:, None]
+    fit = fit_forecast(dates, values)
+    remaining_days = np.arange(len(dates), len(dates) + 16)
+    expected = values[dates >= '2024-03-01'].sum() + (100 + 2 * remaining_days).sum()
+    print(f"Trend recovery: projected {fit['projected'][0]:.2f}, expected {expected:.2f}")
+    return abs(fit['projected'][0] - expected) < 1e-6 * expected
+
+
+if __name__ == '__main__':
+    print("Benchmarking batched cost forecasting...")
+    print("-" * 50)
+
+    trend_ok = test_recovers_trend()
+    fit_ok = test_fit_latency()
+    end_to_end_ok = test_end_to_end_latency()
+
+    print("-" * 50)
+    print(f"Trend recovery: {'✓' if trend_ok else '✗'}")
+    print(f"Fit latency: {'✓' if fit_ok else '✗'}")
+    print(f"End to end latency: {'✓' if end_to_end_ok else '✗'}")
+    raise SystemExit(0 if trend_ok and fit_ok and end_to_end_ok else 1)
@@ -0,0 +1,333 @@
+import os
+import io
+import gzip
+import queue
+import sqlite3
+import zipfile
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
+import pandas as pd
+from dataset_store import DatasetStore
+from cost_processing import transform_csv_to_cost_data
+
+# Rows read from a CSV stream at a time. Workers hand each chunk to the writer
+# through a bounded queue, so memory holds at most a few chunks per worker
+# rather than whole decompressed files
+CHUNK_ROWS = 50000
+
+BULK_EXTENSIONS = ('.csv', '.csv.gz', '.zip')
+
+
+def bulk_suffix(filename: str) -> Optional[str]:
+    """Return the supported extension ``filename`` ends with, if any"""
+    lower = filename.lower()
+    for ext in sorted(BULK_EXTENSIONS, key=len, reverse=True):
+        if lower.endswith(ext):
+            return ext
+    return None
+
+
+def is_bulk_file(filename: str) -> bool:
+    return bulk_suffix(filename) is not None
+
+
+def _is_csv_member(name: str) -> bool:
+    lower = name.lower()
+    return (lower.endswith('.csv') or lower.endswith('.csv.gz')) and not os.path.basename(name).startswith('.')
+
+
+def _outside_root(path: str, root: str) -> bool:
+    resolved = os.path.realpath(path)
+    return resolved != root and not resolved.startswith(root + os.sep)
+
+
+def collect_sources(paths: List[str], base: Optional[str] = None,
+                    allowed_root: Optional[str] = None,
+                    names: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """Expand files, zip archives and directories into a flat list of CSV sources.
+
+    With ``allowed_root``, files whose real path (after symlinks) is outside it are skipped.
+    ``names`` maps top-level paths to the names reported for them, such as the
+    original filenames of spooled uploads.
+    """
+    sources = []
+    for path in paths:
+        if base and allowed_root and _outside_root(path, allowed_root):
+            continue
+        # Files found in a directory are named relative to it so reports stay unambiguous
+        if base:
+            name = os.path.relpath(path, base)
+        else:
+            name = (names or {}).get(path, os.path.basename(path))
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    if is_bulk_file(filename):
+                        sources.extend(collect_sources([os.path.join(dirpath, filename)], base or path, allowed_root))
+        elif path.lower().endswith('.zip'):
+            with zipfile.ZipFile(path) as archive:
+                for member in archive.namelist():
+                    if _is_csv_member(member):
+                        sources.append({'name': f'{name}:{member}', 'path': path, 'member': member})
+        elif _is_csv_member(path):
+            sources.append({'name': name, 'path': path, 'member': None})
+        else:
+            raise ValueError(f'Unsupported file type: {path}')
+    return sources
+
+
+def _open_source(source: Dict[str, Any], archive: Optional[zipfile.ZipFile]):
+    """Open a source as a binary stream, decompressing gzip on the fly"""
+    name = source['member'] or source['path']
+    stream = archive.open(source['member']) if archive else open(source['path'], 'rb')
+    if name.lower().endswith('.gz'):
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+# Queue to the writer, inherited by each worker process
+_results = None
+
+
+def _init_worker(results):
+    global _results
+    _results = results
+
+
+def process_source(source: Dict[str, Any]):
+    """Worker: stream one CSV source, sending each transformed chunk to the writer.
+
+    Ends with a ``done`` or ``error`` message for the source so the writer knows
+    all of its chunks have arrived.
+    """
+    archive = None
+    try:
+        archive = zipfile.ZipFile(source['path']) if source['member'] else None
+        stream = _open_source(source, archive)
+        with io.TextIOWrapper(stream, encoding='utf-8') as text:
+            for chunk in pd.read_csv(text, chunksize=CHUNK_ROWS):
+                # Blocks while the writer is behind
+                _results.put(('chunk', source['id'], chunk, transform_csv_to_cost_data(chunk)))
+        _results.put(('done', source['id'], None, None))
+    except Exception as e:
+        _results.put(('error', source['id'], str(e), None))
+    finally:
+        if archive:
+            archive.close()
+
+
+class BulkWriter:
+    """Single writer that appends every worker's output into one dataset version"""
+
+    def __init__(self, database_path: str, table_name: str):
+        self.conn = sqlite3.connect(database_path)
+        # The version is discarded on failure, so a rollback journal is not needed
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.table_name = table_name
+        self.columns = {}
+
+    def _append(self, table, df):
+        known = self.columns.get(table)
+        if known is None:
+            self.columns[table] = list(df.columns)
+            last_rowid = 0
+        else:
+            # CUR schemas drift between months; widen the table instead of failing
+            for col in df.columns:
+                if col not in known:
+                    self.conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}"')
+                    known.append(col)
+            last_rowid = self.conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+        df.to_sql(table, self.conn, if_exists='append', index=False, chunksize=CHUNK_ROWS)
+        # Appends from the only writer get consecutive rowids
+        return (table, last_rowid + 1, last_rowid + len(df))
+
+    def write(self, raw, cost_data: List[Dict[str, Any]]) -> List[tuple]:
+        """Append one chunk and return the rowid ranges it occupies"""
+        ranges = []
+        if not raw.empty:
+            ranges.append(self._append(self.table_name, raw))
+        if cost_data:
+            ranges.append(self._append('processed_cost_data', pd.DataFrame(cost_data)))
+        return ranges
+
+    def remove(self, ranges: List[tuple]):
+        """Delete rows previously written by ``write``"""
+        for table, first, last in ranges:
+            self.conn.execute(f'DELETE FROM "{table}" WHERE rowid BETWEEN ? AND ?', (first, last))
+        self.conn.commit()
+
+    def summary(self) -> Dict[str, Any]:
+        if 'processed_cost_data' not in self.columns:
+            return {'cost_rows': 0, 'total_cost': 0, 'date_range': {'start': None, 'end': None},
+                    'services': 0, 'regions': 0}
+        cost_rows, total_cost, start, end, services, regions = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(cost), 0), MIN(date), MAX(date), "
+            "COUNT(DISTINCT service), COUNT(DISTINCT region) FROM processed_cost_data"
+        ).fetchone()
+        return {
+            'cost_rows': cost_rows,
+            'total_cost': round(total_cost, 2),
+            'date_range': {
+                'start': start,
+                'end': end
+            },
+            'services': services,
+            'regions': regions
+        }
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def bulk_ingest(paths: List[str], store: DatasetStore, table_name: str = 'cost_data',
+                max_workers: Optional[int] = None,
+                progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                allowed_root: Optional[str] = None, allow_partial: bool = False,
+                names: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Ingest many CUR files concurrently and publish them as one dataset version.
+
+    By default nothing is published if any file fails. With ``allow_partial``
+    the rows of failed files are removed and the remaining files are published.
+    """
+    sources = collect_sources(paths, allowed_root=allowed_root, names=names)
+    if not sources:
+        raise ValueError('No CSV files found')
+
+    max_workers = max_workers or os.cpu_count() or 1
+    for index, source in enumerate(sources):
+        source['id'] = index
+    handle = store.create_version([table_name, 'processed_cost_data'])
+    writer = BulkWriter(handle['path'], table_name)
+    rows = [0] * len(sources)
+    cost_rows = [0] * len(sources)
+    written = [[] for _ in sources]
+    files = []
+    failed = []
+
+    def finish(source, report):
+        report.update({
+            'file': source['name'],
+            'rows': rows[source['id']],
+            'cost_rows': cost_rows[source['id']],
+            'completed': len(files) + 1,
+            'total': len(sources)
+        })
+        files.append(report)
+        if progress:
+            progress(report)
+
+    def fail(source, error):
+        failed.append(source['id'])
+        if allow_partial:
+            # Drop whatever the file wrote before it failed so no month is half-counted
+            writer.remove(written[source['id']])
+        finish(source, {'status': 'error', 'error': error})
+
+    results = multiprocessing.Queue(maxsize=max_workers * 2)
+    executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(results,))
+    futures = {executor.submit(process_source, source): source for source in sources}
+    finished = set()
+
+    try:
+        while len(finished) < len(sources):
+            try:
+                kind, source_id, raw, cost_data = results.get(timeout=1)
+            except queue.Empty:
+                # A worker that died without reporting would otherwise stall the writer
+                for future, source in futures.items():
+                    if source['id'] not in finished and future.done() and future.exception():
+                        finished.add(source['id'])
+                        fail(source, str(future.exception()))
+                continue
+
+            source = sources[source_id]
+            if kind == 'chunk':
+                rows[source_id] += len(raw)
+                cost_rows[source_id] += len(cost_data)
+                # Once a file has failed an all-or-nothing ingest, only collect the remaining reports
+                if allow_partial or not failed:
+                    written[source_id].extend(writer.write(raw, cost_data))
+            elif kind == 'done':
+                finished.add(source_id)
+                finish(source, {'status': 'ok'})
+            else:
+                finished.add(source_id)
+                fail(source, raw)
+        summary = writer.summary()
+        writer.close()
+    except Exception:
+        executor.shutdown(wait=False, cancel_futures=True)
+        # Drain so workers blocked on the queue can finish their current file
+        while not all(future.done() for future in futures):
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        writer.conn.close()
+        store.discard(handle)
+        raise
+    executor.shutdown()
+
+    cost_rows_total = summary.pop('cost_rows')
+    if (failed and not allow_partial) or cost_rows_total == 0:
+        store.discard(handle)
+        return {'dataset_version': None, 'files': files, 'failed': len(failed), 'cost_rows': 0, 'summary': None}
+
+    try:
+        version = store.publish(handle)
+    except Exception:
+        store.discard(handle)
+        raise
+    return {
+        'dataset_version': version,
+        'files': files,
+        'failed': len(failed),
+        'cost_rows': cost_rows_total,
+        'summary': summary
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk ingest AWS Cost & Usage Report files')
+    parser.add_argument('paths', nargs='+', help='.csv, .csv.gz or .zip files, or directories containing them')
+    parser.add_argument('--table-name', default='cost_data', help='Table for the raw CSV rows')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (defaults to CPU count)')
+    parser.add_argument('--datasets', default='datasets', help='Dataset versions folder')
+    parser.add_argument('--database', default='data.db', help='Legacy database used before the first version')
+    parser.add_argument('--allow-partial', action='store_true',
+                        help='Publish even if some files fail, leaving out their rows')
+    parser.add_argument('--grace-period', type=int, default=int(os.getenv('DATASET_GRACE_PERIOD', '300')),
+                        help='Seconds to keep superseded versions (defaults to DATASET_GRACE_PERIOD, as the server does)')
+    args = parser.parse_args()
+
+    store = DatasetStore(args.datasets, legacy_database=args.database, grace_period=args.grace_period)
+
+    def print_progress(report):
+        status = f"{report['rows']} rows" if report['status'] == 'ok' else f"failed after {report['rows']} rows: {report['error']}"
+        print(f"[{report['completed']}/{report['total']}] {report['file']}: {status}")
+
+    result = bulk_ingest(args.paths, store, args.table_name, args.workers, print_progress,
+                         allow_partial=args.allow_partial)
+
+    print('-' * 50)
+    if result['dataset_version'] is None:
+        if result['failed']:
+            print(f"{result['failed']} files failed; nothing was published (use --allow-partial to skip them)")
+        else:
+            print('No valid cost data found; nothing was published')
+        return 1
+    if result['failed']:
+        print(f"Skipped {result['failed']} failed files")
+    summary = result['summary']
+    print(f"Published dataset version {result['dataset_version']}")
+    print(f"Cost rows: {result['cost_rows']}  Total cost: ${summary['total_cost']:.2f}")
+    print(f"Date range: {summary['date_range']['start']} to {summary['date_range']['end']}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+import pandas as pd
+
+def normalize_date(date_str):
+    """Normalize date string to YYYY-MM-DD format"""
+    try:
+        date = pd.to_datetime(date_str)
+        return date.strftime('%Y-%m-%d')
+    except:
+        return date_str
+
+def normalize_service_name(service):
+    """Map AWS service codes to friendly names"""
+    service_map = {
+        'AmazonEC2': 'EC2',
+        'AmazonS3': 'S3', 
+        'AmazonRDS': 'RDS',
+        'AWSLambda': 'Lambda',
+        'AmazonCloudFront': 'CloudFront',
+        'AmazonDynamoDB': 'DynamoDB',
+        'AmazonECS': 'ECS',
+        'AmazonEKS': 'EKS',
+        'AmazonElastiCache': 'ElastiCache',
+        'AmazonVPC': 'VPC',
+        'AmazonRoute53': 'Route53',
+    }
+    return service_map.get(service, service)
+
+def extract_tags(row):
+    """Extract tags from AWS CSV row"""
+    tags = {}
+    for col in row.index:
+        if col.startswith('resourceTags/') or col.startswith('tag:'):
+            tag_name = col.replace('resourceTags/', '').replace('tag:', '')
+            if pd.notna(row[col]) and row[col]:
+                tags[tag_name] = str(row[col])
+    return tags if tags else None
+
+def transform_csv_to_cost_data(df):
+    """Transform CSV DataFrame to CostDataPoint format"""
+    cost_data = []
+    
+    for _, row in df.iterrows():
+        # Try different column name formats for AWS Cost & Usage Report
+        date = (row.get('lineItem/UsageStartDate') or 
+                row.get('UsageStartDate') or 
+                row.get('Date') or 
+                row.get('date') or '')
+        
+        service = (row.get('lineItem/ProductCode') or
+                  row.get('ProductCode') or
+                  row.get('Service') or
+                  row.get('service') or 'Unknown')
+        
+        region = (row.get('product/region') or
+                 row.get('Region') or
+                 row.get('region') or 'global')
+        
+        cost_str = (row.get('lineItem/UnblendedCost') or
+                   row.get('UnblendedCost') or
+                   row.get('Cost') or
+                   row.get('cost') or '0')
+        
+        try:
+            cost = float(cost_str) if pd.notna(cost_str) else 0
+        except (ValueError, TypeError):
+            cost = 0
+        
+        # Only include rows with valid date and positive cost
+        if date and cost > 0:
+            normalized_date = normalize_date(date)
+            normalized_service = normalize_service_name(service)
+            
+            cost_point = {
+                'date': normalized_date,
+                'service': normalized_service,
+                'region': region or 'global',
+                'cost': round(cost, 2),
+            }
+            
+            # Add optional fields if they exist
+            resource_id = (row.get('lineItem/ResourceId') or 
+                          row.get('ResourceId'))
+            if resource_id and pd.notna(resource_id):
+                cost_point['resourceId'] = str(resource_id)
+            
+            tags = extract_tags(row)
+            if tags:
+                cost_point['tags'] = str(tags)  # Convert dict to string for SQLite storage
+                
+            cost_data.append(cost_point)
+    
+    return cost_data
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import fcntl
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import quote
+
+
+def connect_readonly(path: str) -> sqlite3.Connection:
+    """Open a pinned snapshot; fails instead of creating an empty file if it was collected"""
+    return sqlite3.connect(f'file:{quote(os.path.abspath(path))}?mode=ro', uri=True)
+
+
+class DatasetStore:
+    """Versioned SQLite datasets with an atomically switched "current" pointer.
+
+    Every ingest writes into a brand new database file under ``root``. Once the
+    file is complete the manifest is rewritten via ``os.replace`` so readers
+    either see the old version or the new one, never a half-written table.
+    Readers resolve the current version once per request and keep using that
+    file, and superseded versions are deleted after ``grace_period`` seconds.
+
+    The server and the bulk ingest CLI may share ``root``, so manifest updates
+    are serialized with a file lock rather than an in-process lock.
+    """
+
+    MANIFEST = 'manifest.json'
+    LOCK = '.lock'
+
+    def __init__(self, root: str = 'datasets', legacy_database: str = 'data.db', grace_period: int = 300):
+        self.root = root
+        self.legacy_database = legacy_database
+        self.grace_period = grace_period
+        os.makedirs(self.root, exist_ok=True)
+
+    @contextmanager
+    def _write_lock(self):
+        # flock is held per open file, so this also excludes other threads
+        with open(os.path.join(self.root, self.LOCK), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, self.MANIFEST)
+
+    def _version_path(self, version: str) -> str:
+        return os.path.join(self.root, f'{version}.db')
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'current': None, 'versions': {}}
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='manifest.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._manifest_path())
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def current_version(self) -> Optional[str]:
+        """Return the id of the published version, or None for the legacy database"""
+        return self._read_manifest().get('current')
+
+    def current(self) -> Tuple[Optional[str], str]:
+        """Resolve the current version id and its database file in one read"""
+        version = self.current_version()
+        if version is None:
+            return None, self.legacy_database
+        return version, self._version_path(version)
+
+    def current_path(self) -> str:
+        """Resolve the database file readers should pin for this request"""
+        return self.current()[1]
+
+    def connect(self, path: Optional[str] = None) -> sqlite3.Connection:
+        path = path or self.current_path()
+        if path == self.legacy_database:
+            # The legacy database is never collected and may not exist yet
+            conn = sqlite3.connect(path)
+        else:
+            conn = connect_readonly(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        manifest = self._read_manifest()
+        return [
+            {
+                'version': version,
+                'current': version == manifest.get('current'),
+                **info
+            }
+            for version, info in sorted(manifest['versions'].items())
+        ]
+
+    def _carry_over(self, path: str, source: str, replace_tables: List[str]):
+        """Make every table not in ``replace_tables`` a copy of the one in ``source``.
+
+        Indexes, triggers and views on carried-over tables are copied with them.
+        """
+        conn = sqlite3.connect(path)
+        # Dropping a table also drops its indexes and triggers; views must go separately
+        existing = conn.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'view');").fetchall()
+        for kind, name in existing:
+            if name not in replace_tables and not name.startswith('sqlite_'):
+                conn.execute(f'DROP {kind.upper()} main."{name}"')
+        if os.path.exists(source):
+            conn.execute("ATTACH DATABASE ? AS previous", (source,))
+            cursor = conn.execute("SELECT name, sql FROM previous.sqlite_master WHERE type='table';")
+            for name, create_sql in cursor.fetchall():
+                if name in replace_tables or name.startswith('sqlite_'):
+                    continue
+                conn.execute(create_sql)
+                conn.execute(f'INSERT INTO main."{name}" SELECT * FROM previous."{name}"')
+            cursor = conn.execute(
+                "SELECT tbl_name, sql FROM previous.sqlite_master "
+                "WHERE type IN ('index', 'trigger', 'view') AND sql IS NOT NULL "
+                "ORDER BY CASE type WHEN 'index' THEN 0 WHEN 'view' THEN 1 ELSE 2 END;"
+            )
+            for table, create_sql in cursor.fetchall():
+                if table not in replace_tables:
+                    conn.execute(create_sql)
+            conn.commit()
+            conn.execute("DETACH DATABASE previous")
+        conn.commit()
+        conn.close()
+
+    def create_version(self, replace_tables: List[str]) -> Dict[str, Any]:
+        """Start a new unpublished version.
+
+        Tables of the current version that are not in ``replace_tables`` are
+        carried over so an upload only replaces what it actually rewrites.
+        Returns a handle to pass to ``publish`` or ``discard``.
+        """
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        path = self._version_path(version)
+        base, source = self.current()
+
+        # Held until publish or discard so garbage collection leaves the file
+        # alone; the lock goes away with the process if the ingest dies
+        in_use = open(path, 'ab')
+        fcntl.flock(in_use, fcntl.LOCK_EX)
+        try:
+            self._carry_over(path, source, replace_tables)
+        except Exception:
+            in_use.close()
+            os.remove(path)
+            raise
+
+        return {'version': version, 'path': path, 'base': base,
+                'replace_tables': list(replace_tables), 'in_use': in_use}
+
+    def publish(self, handle: Dict[str, Any]) -> str:
+        """Atomically make a finished version current and collect old ones.
+
+        If another ingest published since ``create_version``, the carried-over
+        tables are re-copied from that version first so its changes survive.
+        """
+        with self._write_lock():
+            manifest = self._read_manifest()
+            if manifest.get('current') != handle['base']:
+                current = manifest.get('current')
+                source = self.legacy_database if current is None else self._version_path(current)
+                self._carry_over(handle['path'], source, handle['replace_tables'])
+            now = time.time()
+            previous = manifest.get('current')
+            if previous in manifest['versions']:
+                manifest['versions'][previous]['retired_at'] = now
+            manifest['versions'][handle['version']] = {'published_at': now, 'retired_at': None}
+            manifest['current'] = handle['version']
+            self._write_manifest(manifest)
+        handle['in_use'].close()
+
+        self.collect_garbage()
+        return handle['version']
+
+    def discard(self, handle: Dict[str, Any]):
+        """Drop a version that failed before being published"""
+        handle['in_use'].close()
+        with self._write_lock():
+            # publish may have switched the pointer before failing; never delete a listed version
+            if handle['version'] in self._read_manifest()['versions']:
+                return
+            try:
+                os.remove(handle['path'])
+            except FileNotFoundError:
+                pass
+
+    def _remove_orphans(self, manifest: Dict[str, Any], cutoff: float) -> List[str]:
+        """Delete version files left behind by ingests that died before publishing"""
+        removed = []
+        for filename in os.listdir(self.root):
+            version, ext = os.path.splitext(filename)
+            if ext != '.db' or version in manifest['versions']:
+                continue
+            path = os.path.join(self.root, filename)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                with open(path, 'ab') as f:
+                    # Still locked means an ingest is writing it
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.remove(path)
+            except (BlockingIOError, FileNotFoundError):
+                continue
+            removed.append(version)
+        return removed
+
+    def collect_garbage(self) -> List[str]:
+        """Delete versions superseded, or abandoned unpublished, more than ``grace_period`` seconds ago"""
+        removed = []
+        with self._write_lock():
+            manifest = self._read_manifest()
+            cutoff = time.time() - self.grace_period
+            for version, info in list(manifest['versions'].items()):
+                if version == manifest.get('current'):
+                    continue
+                retired_at = info.get('retired_at')
+                if retired_at is not None and retired_at < cutoff:
+                    try:
+                        os.remove(self._version_path(version))
+                    except FileNotFoundError:
+                        pass
+                    del manifest['versions'][version]
+                    removed.append(version)
+            if removed:
+                self._write_manifest(manifest)
+            removed.extend(self._remove_orphans(manifest, cutoff))
+        return removed
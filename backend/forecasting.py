@@ -0,0 +1,186 @@
+import threading
+from statistics import NormalDist
+from typing import Dict, Any, List, Optional
+import numpy as np
+import pandas as pd
+from dataset_store import connect_readonly
+
+
+def load_cost_matrix(database_path: str):
+    """Build a date x (service, region) matrix of daily cost from processed_cost_data"""
+    conn = connect_readonly(database_path)
+    try:
+        # Nothing has been uploaded yet on a fresh install
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='processed_cost_data'"
+        ).fetchone()
+        if not exists:
+            return pd.DatetimeIndex([]), [], np.zeros((0, 0))
+        df = pd.read_sql_query(
+            "SELECT date, service, region, SUM(cost) AS cost FROM processed_cost_data GROUP BY date, service, region",
+            conn
+        )
+    finally:
+        conn.close()
+
+    if df.empty:
+        return pd.DatetimeIndex([]), [], np.zeros((0, 0))
+
+    df['date'] = pd.to_datetime(df['date'])
+    matrix = df.pivot_table(index='date', columns=['service', 'region'], values='cost', aggfunc='sum')
+    # Days without a line item for a series cost nothing that day
+    dates = pd.date_range(matrix.index.min(), matrix.index.max(), freq='D')
+    matrix = matrix.reindex(dates).fillna(0.0)
+    return dates, list(matrix.columns), matrix.to_numpy(dtype=float)
+
+
+def _design_matrix(t: np.ndarray, weekday: np.ndarray, seasonal: bool, trend: bool) -> np.ndarray:
+    """Intercept, optional linear trend and optional day-of-week dummies (Monday is the baseline)"""
+    columns = [np.ones(len(t))]
+    if trend:
+        columns.append(t)
+    if seasonal:
+        for day in range(1, 7):
+            columns.append((weekday == day).astype(float))
+    return np.column_stack(columns)
+
+
+def fit_series(dates: pd.DatetimeIndex, values: np.ndarray) -> Dict[str, Any]:
+    """Fit trend + weekly seasonality to every column of ``values`` at once.
+
+    All series share the same design matrix, so a single least-squares solve
+    gives every series' coefficients. The result does not depend on the
+    interval level; pass it to ``apply_level`` for month-end projections.
+    """
+    n_days, n_series = values.shape
+    last = dates[-1]
+    month_end = last + pd.offsets.MonthEnd(0)
+    month_start = last.replace(day=1)
+
+    # Shorter histories cannot support the full model
+    seasonal = n_days >= 21
+    trend = n_days >= 3
+
+    t = np.arange(n_days, dtype=float)
+    X = _design_matrix(t, dates.weekday.to_numpy(), seasonal, trend)
+    n_params = X.shape[1]
+
+    coef, _, _, _ = np.linalg.lstsq(X, values, rcond=None)
+    residuals = values - X @ coef
+    dof = max(n_days - n_params, 1)
+    sigma2 = (residuals ** 2).sum(axis=0) / dof
+
+    future_dates = pd.date_range(last + pd.Timedelta(days=1), month_end, freq='D')
+    horizon = len(future_dates)
+    month_to_date = values[dates >= month_start].sum(axis=0)
+
+    remaining = np.zeros(n_series)
+    variance_factor = 0.0
+    if horizon > 0:
+        t_future = np.arange(n_days, n_days + horizon, dtype=float)
+        X_future = _design_matrix(t_future, future_dates.weekday.to_numpy(), seasonal, trend)
+        remaining = np.clip(X_future @ coef, 0.0, None).sum(axis=0)
+
+        # Variance of the summed forecast is sigma^2 * (h + 1' Xf (X'X)^-1 Xf' 1); the factor is shared by all series
+        xtx_inv = np.linalg.pinv(X.T @ X)
+        summed = X_future.sum(axis=0)
+        variance_factor = float(horizon + summed @ xtx_inv @ summed)
+
+    return {
+        'month_to_date': month_to_date,
+        'projected': month_to_date + remaining,
+        'variance': sigma2 * variance_factor,
+        'daily_trend': coef[1] if trend else np.zeros(n_series),
+        'month_end': month_end,
+        'horizon': horizon
+    }
+
+
+def apply_level(fit: Dict[str, Any], level: float) -> Dict[str, Any]:
+    """Add the prediction interval for ``level`` to a ``fit_series`` result"""
+    margin = NormalDist().inv_cdf(0.5 + level / 2) * np.sqrt(fit['variance'])
+    return {
+        **fit,
+        'lower': np.maximum(fit['projected'] - margin, fit['month_to_date']),
+        'upper': fit['projected'] + margin
+    }
+
+
+def fit_forecast(dates: pd.DatetimeIndex, values: np.ndarray, level: float = 0.9) -> Dict[str, Any]:
+    """Fit every series and project month-end spend with a ``level`` prediction interval"""
+    return apply_level(fit_series(dates, values), level)
+
+
+class CostForecaster:
+    """Month-end spend forecasts for every service/region, cached per dataset version"""
+
+    def __init__(self, max_cached_versions: int = 4):
+        self.max_cached_versions = max_cached_versions
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def forecast(self, database_path: str, version: Optional[str], level: float = 0.9) -> Dict[str, Any]:
+        with self._lock:
+            fitted = self._cache.get(version)
+            if fitted is not None:
+                # Keep recently used versions at the end so they are evicted last
+                self._cache[version] = self._cache.pop(version)
+
+        if fitted is None:
+            fitted = self._fit(database_path)
+            with self._lock:
+                self._cache[version] = fitted
+                # Dataset versions are immutable; only the most recently used few are worth keeping
+                while len(self._cache) > self.max_cached_versions:
+                    del self._cache[next(iter(self._cache))]
+
+        return self._format(fitted, level)
+
+    def _fit(self, database_path: str) -> Dict[str, Any]:
+        """Level-independent fit of a dataset version, which is what gets cached"""
+        dates, series, values = load_cost_matrix(database_path)
+        if len(dates) == 0:
+            return {'as_of': None, 'series': [], 'fit': None}
+        return {'as_of': dates[-1], 'series': series, 'fit': fit_series(dates, values)}
+
+    def _format(self, fitted: Dict[str, Any], level: float) -> Dict[str, Any]:
+        if fitted['fit'] is None:
+            return {'as_of': None, 'month_end': None, 'level': level, 'series': [], 'total': None}
+
+        fit = apply_level(fitted['fit'], level)
+
+        rows: List[Dict[str, Any]] = []
+        for i, (service, region) in enumerate(fitted['series']):
+            rows.append({
+                'service': service,
+                'region': region,
+                'month_to_date': round(float(fit['month_to_date'][i]), 2),
+                'projected': round(float(fit['projected'][i]), 2),
+                'lower': round(float(fit['lower'][i]), 2),
+                'upper': round(float(fit['upper'][i]), 2),
+                'daily_trend': round(float(fit['daily_trend'][i]), 4)
+            })
+        rows.sort(key=lambda row: row['projected'], reverse=True)
+
+        return {
+            'as_of': fitted['as_of'].strftime('%Y-%m-%d'),
+            'month_end': fit['month_end'].strftime('%Y-%m-%d'),
+            'level': level,
+            'series': rows,
+            'total': summarize_series(rows, level)
+        }
+
+
+def summarize_series(rows: List[Dict[str, Any]], level: float) -> Dict[str, float]:
+    """Combine per-series forecasts, treating series errors as independent"""
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    month_to_date = sum(row['month_to_date'] for row in rows)
+    projected = sum(row['projected'] for row in rows)
+    variance = sum(((row['upper'] - row['projected']) / z) ** 2 for row in rows) if z else 0.0
+    margin = z * variance ** 0.5
+    return {
+        'month_to_date': round(month_to_date, 2),
+        'projected': round(projected, 2),
+        'lower': round(max(projected - margin, month_to_date), 2),
+        'upper': round(projected + margin, 2)
+    }
@@ -1,9 +1,10 @@
 import os
 import sqlite3
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage
+from dataset_store import connect_readonly
 
 load_dotenv()
 
@@ -15,9 +16,9 @@ class NaturalLanguageQueryService:
             anthropic_api_key=os.getenv('ANTHROPIC_API_KEY')
         )
     
-    def get_db_schema(self) -> str:
+    def get_db_schema(self, database_path: Optional[str] = None) -> str:
         """Get database schema information for context"""
-        conn = sqlite3.connect(self.database_path)
+        conn = connect_readonly(database_path or self.database_path)
         cursor = conn.cursor()
         
         # Get all table names
@@ -37,9 +38,9 @@ class NaturalLanguageQueryService:
         conn.close()
         return "\n\n".join(schema_info)
     
-    def generate_sql_query(self, natural_language_question: str) -> str:
+    def generate_sql_query(self, natural_language_question: str, database_path: Optional[str] = None) -> str:
         """Convert natural language question to SQL query"""
-        schema = self.get_db_schema()
+        schema = self.get_db_schema(database_path)
         
         system_prompt = f"""You are an expert SQL query generator. Given a database schema and a natural language question, generate a valid SQLite SELECT query.
 
@@ -80,9 +81,9 @@ Examples:
         
         return sql_query.strip()
     
-    def execute_query(self, sql_query: str) -> List[Dict[str, Any]]:
+    def execute_query(self, sql_query: str, database_path: Optional[str] = None) -> List[Dict[str, Any]]:
         """Execute SQL query and return results"""
-        conn = sqlite3.connect(self.database_path)
+        conn = connect_readonly(database_path or self.database_path)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -131,14 +132,14 @@ Rules:
         response = self.llm.invoke(messages)
         return response.content.strip()
     
-    def process_natural_language_query(self, question: str) -> Dict[str, Any]:
+    def process_natural_language_query(self, question: str, database_path: Optional[str] = None) -> Dict[str, Any]:
         """Main method to process a natural language question end-to-end"""
         try:
             # Generate SQL query
-            sql_query = self.generate_sql_query(question)
+            sql_query = self.generate_sql_query(question, database_path)
             
-            # Execute query
-            results = self.execute_query(sql_query)
+            # Execute query against the same database the schema came from
+            results = self.execute_query(sql_query, database_path)
             
             # Generate natural language response
             nl_response = self.generate_natural_language_response(question, results, sql_query)
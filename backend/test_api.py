@@ -1,6 +1,8 @@
 import requests
 import pandas as pd
 import io
+import gzip
+import zipfile
 
 # Test data
 test_csv_data = """name,age,city
@@ -8,6 +10,15 @@ John,25,New York
 Jane,30,Los Angeles
 Bob,35,Chicago"""
 
+test_cur_data = """lineItem/UsageStartDate,lineItem/ProductCode,product/region,lineItem/UnblendedCost
+2024-01-01T00:00:00Z,AmazonEC2,us-east-1,120.50
+2024-01-01T00:00:00Z,AmazonS3,us-east-1,15.25
+2024-01-02T00:00:00Z,AmazonEC2,us-east-1,118.75"""
+test_cur_rows = 3
+
+# Dataset version published by test_upload_bulk, checked by later tests
+published_version = None
+
 def test_upload():
     """Test CSV upload endpoint"""
     url = "http://localhost:5000/upload"
@@ -26,6 +37,38 @@ def test_upload():
         print(f"Upload test failed: {e}")
         return False
 
+def test_upload_bulk():
+    """Test bulk upload endpoint with a plain, a gzipped and a zipped CUR file"""
+    global published_version
+    url = "http://localhost:5000/upload/bulk"
+    
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('part-3.csv', test_cur_data)
+    
+    files = [
+        ('files', ('part-1.csv', test_cur_data, 'text/csv')),
+        ('files', ('part-2.csv.gz', gzip.compress(test_cur_data.encode()), 'application/gzip')),
+        ('files', ('parts.zip', archive.getvalue(), 'application/zip'))
+    ]
+    data = {'table_name': 'test_cur'}
+    
+    try:
+        response = requests.post(url, files=files, data=data)
+        print(f"Bulk upload test: {response.status_code}")
+        print(f"Response: {response.json()}")
+        result = response.json()
+        reports = result.get('files', [])
+        published_version = result.get('dataset_version')
+        return (response.status_code == 200
+                and result.get('dataset_version') is not None
+                and len(reports) == 3
+                and all(report['status'] == 'ok' for report in reports)
+                and result.get('cost_rows') == 3 * test_cur_rows)
+    except Exception as e:
+        print(f"Bulk upload test failed: {e}")
+        return False
+
 def test_schema():
     """Test schema endpoint"""
     url = "http://localhost:5000/schema"
@@ -66,6 +109,47 @@ def test_tables():
         print(f"Tables test failed: {e}")
         return False
 
+def test_forecast():
+    """Test forecast endpoint"""
+    url = "http://localhost:5000/forecast"
+    
+    try:
+        response = requests.get(url, params={'level': 0.9})
+        print(f"Forecast test: {response.status_code}")
+        print(f"Response: {response.json()}")
+        result = response.json()
+        # test_upload_bulk loaded EC2 and S3 in us-east-1 for January 2024
+        ec2 = [row for row in result.get('series', [])
+               if row['service'] == 'EC2' and row['region'] == 'us-east-1']
+        return (response.status_code == 200
+                and published_version is not None
+                and result.get('dataset_version') == published_version
+                and result.get('month_end') == '2024-01-31'
+                and len(ec2) == 1
+                and ec2[0]['lower'] <= ec2[0]['projected'] <= ec2[0]['upper']
+                and ec2[0]['projected'] >= ec2[0]['month_to_date'])
+    except Exception as e:
+        print(f"Forecast test failed: {e}")
+        return False
+
+def test_versions():
+    """Test dataset versions endpoint"""
+    url = "http://localhost:5000/versions"
+    
+    try:
+        response = requests.get(url)
+        print(f"Versions test: {response.status_code}")
+        print(f"Response: {response.json()}")
+        result = response.json()
+        current = [version for version in result.get('versions', []) if version['current']]
+        return (response.status_code == 200
+                and published_version is not None
+                and result.get('current') == published_version
+                and [version['version'] for version in current] == [published_version])
+    except Exception as e:
+        print(f"Versions test failed: {e}")
+        return False
+
 if __name__ == "__main__":
     print("Testing Flask API endpoints...")
     print("Make sure the Flask app is running on localhost:5000")
@@ -75,6 +159,9 @@ if __name__ == "__main__":
     upload_ok = test_upload()
     print()
     
+    bulk_ok = test_upload_bulk()
+    print()
+    
     schema_ok = test_schema()
     print()
     
@@ -84,8 +171,17 @@ if __name__ == "__main__":
     query_ok = test_query()
     print()
     
+    forecast_ok = test_forecast()
+    print()
+    
+    versions_ok = test_versions()
+    print()
+    
     print("-" * 50)
     print(f"Upload: {'✓' if upload_ok else '✗'}")
+    print(f"Bulk upload: {'✓' if bulk_ok else '✗'}")
     print(f"Schema: {'✓' if schema_ok else '✗'}")
     print(f"Tables: {'✓' if tables_ok else '✗'}")
-    print(f"Query: {'✓' if query_ok else '✗'}")
\ No newline at end of file
+    print(f"Query: {'✓' if query_ok else '✗'}")
+    print(f"Forecast: {'✓' if forecast_ok else '✗'}")
+    print(f"Versions: {'✓' if versions_ok else '✗'}")
\ No newline at end of file